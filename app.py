@@ -1,12 +1,18 @@
+import os
 import streamlit as st
 import pandas as pd
-import pickle
 import matplotlib.pyplot as plt
 import seaborn as sns
 import time
 import requests
 from io import StringIO
 import numpy as np
+from sklearn.neighbors import BallTree
+from episodes import EpisodeIndex
+from model_registry import MAX_LOADED_MODELS, ModelRegistry, compare_models, load_holdout
+from prediction_cache import PredictionCache
+from probabilistic import AQI_BUCKETS, ConformalAQIPredictor
+from session_memory import active_sessions_report
 
 st.set_page_config(
     page_title="Air Quality Index Dashboard",
@@ -83,22 +89,168 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
+def load_model_registry():
+    return ModelRegistry()
+
 def load_model():
-    with open('aqi_predictor_model.pkl', 'rb') as f:
-        model = pickle.load(f)
-    return model
+    # The registry is shared by all sessions; each rerun picks up the currently
+    # active version, so activating a new model needs no restart.
+    return load_model_registry().get_active()
+
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache(maxsize=50000, ttl=6 * 3600)
+
+@st.cache_resource
+def load_recent_rows():
+    # city_day.csv is parsed once; every comparison size samples from it
+    return load_holdout()
+
+def sample_rows(X, y, size):
+    rows = np.random.default_rng(0).choice(len(X), size=min(size, len(X)), replace=False)
+    return X[rows], y[rows]
+
+PREDICTION_COVERAGE = 0.9
+
+# Each predictor holds its model, so the cache is bounded like the registry's
+@st.cache_resource(max_entries=MAX_LOADED_MODELS)
+def load_probabilistic_predictor(version, calibration_stamp):
+    # Calibrated once per model version on the hold-out rows registered with it.
+    # Rows of city_day.csv may have been used in training, so without a
+    # registered calibration set there are no intervals (None).
+    registry = load_model_registry()
+    calibration = registry.load_calibration(version)
+    if calibration is None:
+        return None
+    return ConformalAQIPredictor(registry.load(version)).fit(*calibration)
+
+def get_probabilistic_predictor(version):
+    # Keyed on the calibration file's stat too, so adding or replacing a
+    # calibration set takes effect without a restart
+    return load_probabilistic_predictor(version, load_model_registry().calibration_stamp(version))
+
+EARTH_RADIUS_KM = 6371.0
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+POLLUTANTS = ['PM2.5', 'PM10', 'NO2', 'CO', 'O3']
+
+# Shared, read-only data is held with st.cache_resource: st.cache_data would hand
+# every rerun of every session its own unpickled copy of the frames.
+@st.cache_resource
+def load_city_metadata():
+    meta = pd.read_csv("city_metadata.csv")
+    meta['State'] = meta['State'].astype('category')
+    meta['Region'] = meta['Region'].astype('category')
+    return meta
 
-@st.cache_data
+@st.cache_resource
 def load_data():
     df = pd.read_csv("city_day.csv")
     df['Date'] = pd.to_datetime(df['Date'])
     df['Month'] = df['Date'].dt.strftime('%b')  # Extract month abbreviation
     df = df.dropna(subset=['PM2.5', 'PM10', 'NO2', 'CO', 'O3', 'AQI'])
+    meta = load_city_metadata()
+    df = df.merge(meta[['City', 'State', 'Region']], on='City', how='left')
+    df = df.sort_values(['City', 'Date'], kind='stable', ignore_index=True)
     all_cities = sorted(df['City'].unique())
     return df, all_cities
 
+@st.cache_resource
+def load_city_slices():
+    df, all_cities = load_data()
+    cities = df['City'].to_numpy()
+    starts = np.searchsorted(cities, all_cities, side='left')
+    stops = np.searchsorted(cities, all_cities, side='right')
+    return {city: slice(start, stop) for city, start, stop in zip(all_cities, starts, stops)}
+
+def get_city_df(city_name):
+    # Rows are sorted by city, so a city is a positional slice of the shared frame
+    # rather than a boolean-mask copy.
+    df, _ = load_data()
+    return df.iloc[load_city_slices().get(city_name, slice(0, 0))]
+
+# Bounded: Compare Cities can request every ordered pair of cities
+@st.cache_resource(max_entries=16)
+def get_cities_csv(cities):
+    df, _ = load_data()
+    slices = load_city_slices()
+    parts = [df.iloc[slices[city]].to_csv(index=False, header=(i == 0)) for i, city in enumerate(cities) if city in slices]
+    return ''.join(parts)
+
+@st.cache_resource
+def load_city_aggregates():
+    # Per-city sums and counts are the building blocks for every regional rollup,
+    # so region-level views never have to rescan the daily rows.
+    df, _ = load_data()
+    meta = load_city_metadata().set_index('City')
+    grouped = df.groupby('City')
+    city_agg = grouped[['AQI'] + POLLUTANTS].sum().add_suffix('_sum')
+    city_agg['Days'] = grouped.size()
+    city_agg['AQI_min'] = grouped['AQI'].min()
+    city_agg['AQI_max'] = grouped['AQI'].max()
+    city_agg['Mean AQI'] = city_agg['AQI_sum'] / city_agg['Days']
+    city_agg = city_agg.join(meta, how='left')
+
+    city_month_agg = df.groupby(['City', 'Month'])['AQI'].agg(['sum', 'count']).reset_index()
+    city_month_agg = city_month_agg.merge(meta[['State', 'Region']], left_on='City', right_index=True, how='left')
+    return city_agg, city_month_agg
+
+@st.cache_resource
+def load_regional_aggregates(level):
+    city_agg, city_month_agg = load_city_aggregates()
+    sum_cols = ['AQI_sum'] + [f'{p}_sum' for p in POLLUTANTS]
+    grouped = city_agg.groupby(level, observed=True)
+    regional_agg = grouped[sum_cols + ['Days', 'Population']].sum()
+    regional_agg['Cities'] = grouped.size()
+    regional_agg['Max AQI'] = grouped['AQI_max'].max()
+    regional_agg['Min AQI'] = grouped['AQI_min'].min()
+    regional_agg['Mean AQI'] = regional_agg['AQI_sum'] / regional_agg['Days']
+    for p in POLLUTANTS:
+        regional_agg[f'Mean {p}'] = regional_agg[f'{p}_sum'] / regional_agg['Days']
+    regional_agg = regional_agg.sort_values('Mean AQI', ascending=False)
+
+    monthly = city_month_agg.groupby([level, 'Month'], observed=True)[['sum', 'count']].sum()
+    regional_month_agg = (monthly['sum'] / monthly['count']).unstack('Month').reindex(columns=MONTHS)
+    return regional_agg, regional_month_agg
+
+@st.cache_resource
+def load_city_month_pivot():
+    _, city_month_agg = load_city_aggregates()
+    pivot = city_month_agg.assign(AQI=city_month_agg['sum'] / city_month_agg['count'])
+    return pivot.pivot(index='City', columns='Month', values='AQI').reindex(columns=MONTHS)
+
+@st.cache_resource
+def load_episode_index():
+    df, _ = load_data()
+    return EpisodeIndex(df)
+
+@st.cache_resource
+def load_city_index():
+    # Only cities with usable rows after load_data's dropna can be neighbours
+    _, all_cities = load_data()
+    meta = load_city_metadata()
+    meta = meta[meta['City'].isin(all_cities)].reset_index(drop=True)
+    coords = np.radians(meta[['Latitude', 'Longitude']].to_numpy())
+    return BallTree(coords, metric='haversine'), meta
+
+def nearest_cities(city_name, k=5):
+    tree, meta = load_city_index()
+    matches = np.flatnonzero(meta['City'].to_numpy() == city_name)
+    if len(matches) == 0:
+        return pd.DataFrame(columns=['City', 'Distance (km)'])
+    coords = np.radians(meta[['Latitude', 'Longitude']].to_numpy()[matches[:1]])
+    dist, idx = tree.query(coords, k=min(k + 1, len(meta)))
+    neighbours = pd.DataFrame({
+        'City': meta['City'].to_numpy()[idx[0]],
+        'Distance (km)': dist[0] * EARTH_RADIUS_KM
+    })
+    return neighbours[neighbours['City'] != city_name].head(k).reset_index(drop=True)
+
+# Overridable so load tests can point the app at a local stub server
+WAQI_API_URL = os.environ.get("WAQI_API_URL", "https://api.waqi.info")
+OPENWEATHER_API_URL = os.environ.get("OPENWEATHER_API_URL", "http://api.openweathermap.org")
+
 def get_live_aqi(city_name):
-    url = f"https://api.waqi.info/feed/{city_name}/?token=fe0547e431226e44d33b4d50af849d737783f9de"
+    url = f"{WAQI_API_URL}/feed/{city_name}/?token=fe0547e431226e44d33b4d50af849d737783f9de"
     try:
         response = requests.get(url, timeout=10)
         data = response.json()
@@ -112,7 +264,7 @@ def get_live_aqi(city_name):
 
 def get_weather_data(city_name):
     api_key = "your_openweathermap_api_key"
-    url = f"http://api.openweathermap.org/data/2.5/weather?q={city_name}&appid={api_key}&units=metric"
+    url = f"{OPENWEATHER_API_URL}/data/2.5/weather?q={city_name}&appid={api_key}&units=metric"
     try:
         response = requests.get(url, timeout=10)
         data = response.json()
@@ -127,6 +279,14 @@ def get_weather_data(city_name):
     except:
         return None
 
+def show_figure(fig):
+    # Figures are closed once rendered, even if rendering fails, so pyplot does
+    # not keep them alive across reruns
+    try:
+        st.pyplot(fig)
+    finally:
+        plt.close(fig)
+
 def estimate_tree_impact(num_trees, current_aqi):
     pm25_reduction = num_trees * 0.3 / 10000
     co2_reduction = num_trees * 0.022
@@ -153,7 +313,7 @@ def estimate_car_removal_impact(num_cars, current_aqi):
         "category": get_aqi_category(new_aqi)
     }
 
-model = load_model()
+model_version, model = load_model()
 df, all_cities = load_data()
 
 aqi_recommendations = {
@@ -502,6 +662,15 @@ def get_aqi_category(aqi):
     else:
         return "Severe"
 
+aqi_category_colors = {
+    'Good': '#00e400',
+    'Satisfactory': '#ffff00',
+    'Moderate': '#ff7e00',
+    'Poor': '#ff0000',
+    'Very Poor': '#8f3f97',
+    'Severe': '#7e0023'
+}
+
 def get_aqi_category_class(aqi_category):
     category_map = {
         'Good': 'aqi-good',
@@ -526,6 +695,8 @@ with st.sidebar:
             "🆚 Compare Cities",
             "🔥 Heatmap",
             "🏆 Top 10 Polluted Cities",
+            "🧭 Regional AQI",
+            "🌍 AQI Map",
             "🚨 Live AQI Alerts",
             "🌱 AQI Assistant"
         ],
@@ -546,6 +717,11 @@ with st.sidebar:
         """)
     st.markdown("---")
     st.info("Select a view to explore AQI data, predict air quality, or get personalized assistance.")
+    if os.environ.get("AQI_MEMORY_REPORT"):
+        with st.expander("Memory per session"):
+            memory_report = active_sessions_report()
+            st.dataframe(memory_report, hide_index=True)
+            st.caption(f"{len(memory_report)} active sessions, {memory_report['Total (bytes)'].sum() / 2 ** 20:.1f} MB held")
 
 if page == "📊 City-wise AQI":
     st.header("📊 City-wise AQI Trends")
@@ -553,7 +729,7 @@ if page == "📊 City-wise AQI":
     with col1:
         city = st.selectbox("Select a city", all_cities, key="city_select")
     
-    city_df = df[df['City'] == city]
+    city_df = get_city_df(city)
     
     if not city_df.empty:
         with st.spinner("Loading AQI trend..."):
@@ -567,12 +743,18 @@ if page == "📊 City-wise AQI":
             ax.set_ylabel('AQI')
             plt.xticks(rotation=45)
             plt.tight_layout()
-            st.pyplot(fig)
+            show_figure(fig)
         
         st.subheader("AQI Summary Statistics")
         summary = city_df['AQI'].agg(['mean', 'min', 'max']).to_frame().T
         summary.columns = ['Mean AQI', 'Min AQI', 'Max AQI']
         st.table(summary.round(2))
+
+        st.subheader("Nearby Cities")
+        city_agg, _ = load_city_aggregates()
+        nearby = nearest_cities(city, k=5)
+        nearby['Mean AQI'] = nearby['City'].map(city_agg['Mean AQI'])
+        st.table(nearby.set_index('City').round(1))
         
         st.subheader("Pollutant Contribution")
         pollutants = ['PM2.5', 'PM10', 'NO2', 'CO', 'O3']
@@ -580,9 +762,9 @@ if page == "📊 City-wise AQI":
         fig, ax = plt.subplots(figsize=(6, 6))
         ax.pie(pollutant_means, labels=pollutants, autopct='%1.1f%%', startangle=90)
         ax.axis('equal')
-        st.pyplot(fig)
+        show_figure(fig)
         
-        csv = city_df.to_csv(index=False)
+        csv = get_cities_csv((city,))
         st.download_button(
             label="Download City Data as CSV",
             data=csv,
@@ -611,14 +793,76 @@ elif page == "🔮 Predict AQI":
             with st.spinner("Predicting..."):
                 time.sleep(1)
                 input_data = [pm25, pm10, no2, co, o3]
-                predicted_aqi = model.predict([input_data])[0]
+                predictor = get_probabilistic_predictor(model_version)
+                if predictor is None:
+                    predicted_aqi = load_prediction_cache().predict(model, model_version, [input_data])[0]
+                else:
+                    prediction = load_prediction_cache().score(
+                        (model_version, PREDICTION_COVERAGE),
+                        [input_data],
+                        lambda X: predictor.predict(X, PREDICTION_COVERAGE).to_numpy()
+                    )[0]
+                    predicted_aqi, lower_aqi, upper_aqi = prediction[:3]
+                    bucket_probs = pd.Series(prediction[3:], index=AQI_BUCKETS)
                 aqi_category = get_aqi_category(predicted_aqi)
                 st.write(f"Predicted AQI: {predicted_aqi:.2f}")
+                if predictor is not None:
+                    st.write(f"{PREDICTION_COVERAGE:.0%} prediction interval: {lower_aqi:.0f} – {upper_aqi:.0f}")
                 st.markdown(f"<span class='{get_aqi_category_class(aqi_category)}'>Air Quality Category: <b>{aqi_category}</b></span>", unsafe_allow_html=True)
+                if predictor is not None:
+                    st.markdown(f"Probability of Poor or worse air (AQI above 200): <b>{bucket_probs[['Poor', 'Very Poor', 'Severe']].sum():.0%}</b>", unsafe_allow_html=True)
+                    st.table((bucket_probs * 100).round(1).rename('Probability (%)').to_frame().T)
                 st.balloons()
                 st.markdown("<h3>AQI Assistant</h3>", unsafe_allow_html=True)
                 st.markdown(f"<div class='chatbot-message'>{aqi_recommendations.get(aqi_category, {}).get('General', 'No recommendations available.')}</div>", unsafe_allow_html=True)
                 st.markdown(long_term_consequences, unsafe_allow_html=True)
+    with col2:
+        st.subheader("Model")
+        st.caption(f"Active model version: {model_version}")
+        load_error = load_model_registry().load_error
+        if load_error is not None:
+            st.warning(f"Model version {load_error[0]} could not be loaded ({load_error[1]}); still serving {model_version}.")
+        if get_probabilistic_predictor(model_version) is None:
+            st.caption(
+                "No calibration set is registered for this version, so no prediction interval is shown. "
+                "Register one with `python model_registry.py register model.pkl --calibration holdout.csv`."
+            )
+        cache_stats = load_prediction_cache().stats()
+        st.caption(
+            f"Prediction cache: {cache_stats['requests']:,} rows, {cache_stats['hits']:,} hits / "
+            f"{cache_stats['misses']:,} misses ({cache_stats['hit_rate']:.0%} hit rate), "
+            f"{cache_stats['deduplicated']:,} deduplicated, {cache_stats['scored']:,} scored, "
+            f"{cache_stats['size']:,} entries"
+        )
+
+    with st.expander("Compare model versions (A/B)"):
+        registry = load_model_registry()
+        versions = registry.versions()
+        if len(versions) < 2:
+            st.info("Register at least two model versions to compare them, e.g. `python model_registry.py register new_model.pkl`.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            index_a = versions.index(model_version) if model_version in versions else 0
+            # B defaults to the newest version other than A (A is usually the newest right after an activation)
+            index_b = len(versions) - 1 if index_a != len(versions) - 1 else len(versions) - 2
+            version_a = col1.selectbox("Model A", versions, index=index_a, key="model_a")
+            version_b = col2.selectbox("Model B", versions, index=index_b, key="model_b")
+            sample_size = col3.number_input("Rows to score", 100, 20000, 2000, step=100)
+            if version_a == version_b:
+                st.info("Choose two different versions to compare.")
+            elif st.button("Run comparison", key="compare_models_button"):
+                with st.spinner("Scoring both models on the same batch..."):
+                    rows = registry.shared_holdout([version_a, version_b])
+                    if rows is None:
+                        rows, source = load_recent_rows(), "recent city_day.csv rows (may overlap training)"
+                    else:
+                        source = "rows held out from the training of both versions"
+                    X, y = sample_rows(*rows, int(sample_size))
+                    report = compare_models({version_a: registry.load(version_a), version_b: registry.load(version_b)}, X, y)
+                st.table(report.round(3))
+                st.caption(f"Scored on {len(X):,} {source}.")
+                if 'mean_abs_disagreement' in report.attrs:
+                    st.write(f"Mean absolute disagreement between A and B: {report.attrs['mean_abs_disagreement']:.2f} AQI points")
 
 elif page == "🆚 Compare Cities":
     st.header("🆚 Compare AQI Between Cities")
@@ -629,8 +873,8 @@ elif page == "🆚 Compare Cities":
     with col2:
         city2 = st.selectbox("City 2", all_cities, index=1, key="city2_select")
     
-    city1_df = df[df['City'] == city1]
-    city2_df = df[df['City'] == city2]
+    city1_df = get_city_df(city1)
+    city2_df = get_city_df(city2)
     
     col1, col2 = st.columns(2)
     with col1:
@@ -647,7 +891,7 @@ elif page == "🆚 Compare Cities":
                 ax.set_ylabel('AQI')
                 plt.xticks(rotation=45)
                 plt.tight_layout()
-                st.pyplot(fig)
+                show_figure(fig)
         else:
             st.warning(f"No historical AQI data available for {city1}.")
     
@@ -665,13 +909,12 @@ elif page == "🆚 Compare Cities":
                 ax.set_ylabel('AQI')
                 plt.xticks(rotation=45)
                 plt.tight_layout()
-                st.pyplot(fig)
+                show_figure(fig)
         else:
             st.warning(f"No historical AQI data available for {city2}.")
     
-    combined_df = pd.concat([city1_df, city2_df])
-    if not combined_df.empty:
-        csv = combined_df.to_csv(index=False)
+    if not (city1_df.empty and city2_df.empty):
+        csv = get_cities_csv((city1, city2))
         st.download_button(
             label="Download Comparison Data as CSV",
             data=csv,
@@ -682,29 +925,83 @@ elif page == "🆚 Compare Cities":
 elif page == "🔥 Heatmap":
     st.header("🔥 AQI Heatmap by Month and City")
     with st.spinner("Generating heatmap..."):
-        heat_df = df.copy()
-        heat_df['Month'] = heat_df['Date'].dt.month_name()
-        pivot = heat_df.pivot_table(index='City', columns='Month', values='AQI', aggfunc='mean')
+        pivot = load_city_month_pivot()
         fig, ax = plt.subplots(figsize=(15, 10))
         sns.heatmap(pivot, cmap="YlOrRd", ax=ax, annot=True, fmt=".1f", cbar_kws={'label': 'AQI'})
         ax.set_title("Average AQI by City and Month")
         plt.tight_layout()
-        st.pyplot(fig)
+        show_figure(fig)
     st.markdown("Insight: Red indicates higher AQI (worse air quality). Compare monthly patterns across cities.")
 
 elif page == "🏆 Top 10 Polluted Cities":
     st.header("🏆 Top 10 Most Polluted Cities")
     with st.spinner("Calculating rankings..."):
-        avg_aqi = df.groupby('City')['AQI'].mean().sort_values(ascending=False).head(10)
+        city_agg, _ = load_city_aggregates()
+        avg_aqi = city_agg['Mean AQI'].sort_values(ascending=False).head(10)
         fig, ax = plt.subplots(figsize=(10, 4))
         ax.barh(avg_aqi.index, avg_aqi.values, color='red')
         ax.set_title("Top 10 Most Polluted Cities")
         ax.set_xlabel('Average AQI')
         ax.set_ylabel('City')
         plt.tight_layout()
-        st.pyplot(fig)
+        show_figure(fig)
     st.markdown("Insight: These cities have the highest average AQI, indicating poorer air quality.")
 
+elif page == "🧭 Regional AQI":
+    st.header("🧭 Regional AQI Rollups")
+    level = st.radio("Group by", ["Region", "State"], horizontal=True, key="region_level")
+    regional_agg, regional_month_agg = load_regional_aggregates(level)
+
+    with st.spinner("Aggregating regions..."):
+        fig, ax = plt.subplots(figsize=(10, 4))
+        ax.barh(regional_agg.index.astype(str), regional_agg['Mean AQI'], color='darkorange')
+        ax.invert_yaxis()
+        ax.set_title(f"Average AQI by {level}")
+        ax.set_xlabel('Average AQI')
+        ax.set_ylabel(level)
+        plt.tight_layout()
+        show_figure(fig)
+
+    summary = regional_agg[['Cities', 'Population', 'Days', 'Mean AQI', 'Min AQI', 'Max AQI']
+                           + [f'Mean {p}' for p in POLLUTANTS]]
+    st.dataframe(summary.round(2))
+
+    area = st.selectbox(f"Select a {level.lower()}", regional_agg.index.astype(str), key="area_select")
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        st.subheader(f"Monthly AQI Trend: {area}")
+        monthly_aqi = regional_month_agg.loc[area]
+        fig, ax = plt.subplots(figsize=(8, 3.5))
+        ax.plot(monthly_aqi.index, monthly_aqi.values, color='darkorange')
+        ax.set_xlabel('Month')
+        ax.set_ylabel('AQI')
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        show_figure(fig)
+    with col2:
+        st.subheader(f"Cities in {area}")
+        city_agg, _ = load_city_aggregates()
+        area_cities = city_agg[city_agg[level] == area][['Days', 'Mean AQI', 'AQI_max']]
+        area_cities.columns = ['Days', 'Mean AQI', 'Max AQI']
+        st.table(area_cities.sort_values('Mean AQI', ascending=False).round(1))
+    st.markdown(f"Insight: Regional averages are weighted by the number of recorded days in each city of the {level.lower()}.")
+
+elif page == "🌍 AQI Map":
+    st.header("🌍 AQI Map")
+    st.markdown("Average historical AQI per city. Larger and redder markers indicate worse air quality.")
+    city_agg, _ = load_city_aggregates()
+    map_df = city_agg[['Latitude', 'Longitude', 'Mean AQI', 'State', 'Region']].reset_index()
+    map_df['Category'] = map_df['Mean AQI'].map(get_aqi_category)
+    map_df['color'] = map_df['Category'].map(aqi_category_colors)
+    map_df['size'] = map_df['Mean AQI'] * 150
+    st.map(map_df, latitude='Latitude', longitude='Longitude', size='size', color='color')
+    st.dataframe(
+        map_df[['City', 'State', 'Region', 'Mean AQI', 'Category']]
+        .sort_values('Mean AQI', ascending=False)
+        .set_index('City')
+        .round(1)
+    )
+
 elif page == "🚨 Live AQI Alerts":
     st.header("🚨 Live AQI Alerts")
     st.markdown("Check real-time AQI for a selected city and receive alerts if air quality is poor.")
@@ -738,6 +1035,31 @@ elif page == "🚨 Live AQI Alerts":
         else:
             st.error(f"Unable to fetch live AQI data for {city}. This city may not have an active monitoring station. Try another city or check your connection.")
 
+    st.subheader(f"Historical Pollution Episodes in {city}")
+    episode_index = load_episode_index()
+    city_days = episode_index.days[episode_index.days['City'] == city]['Date']
+    if not city_days.empty:
+        date_range = st.date_input(
+            "Date range",
+            (city_days.min().date(), city_days.max().date()),
+            min_value=city_days.min().date(),
+            max_value=city_days.max().date(),
+            key="episode_range"
+        )
+        start, end = (date_range if len(date_range) == 2 else (date_range[0], date_range[0]))
+        episodes = episode_index.episodes_for(city, start, end)
+        anomalies = episode_index.anomalies_for(city, start, end)
+        col1, col2 = st.columns(2)
+        col1.metric("Episodes (3+ Poor-or-worse days)", len(episodes))
+        col2.metric("Anomalous readings", len(anomalies))
+        if not episodes.empty:
+            st.dataframe(episodes.drop(columns='City').round({'Mean AQI': 1}), hide_index=True)
+        if not anomalies.empty:
+            st.markdown("Anomalous readings are days more than 3 standard deviations from the trailing 30-day baseline, or sudden day-over-day spikes.")
+            st.dataframe(anomalies.drop(columns='City').round({'Baseline': 1, 'Z-score': 2}), hide_index=True)
+    else:
+        st.info(f"No historical AQI data available for {city}.")
+
 elif page == "🌱 AQI Assistant":
     st.header("🌱 Advanced AQI Assistant")
     st.markdown("Your personal AQI Assistant provides tailored recommendations and estimates the impact of environmental actions like tree planting or car removal.")
@@ -799,7 +1121,7 @@ elif page == "🌱 AQI Assistant":
             ax.set_title(f'AQI Before and After Planting {num_trees:,} Trees')
             ax.set_ylabel('AQI')
             plt.tight_layout()
-            st.pyplot(fig)
+            show_figure(fig)
 
         elif action == "Remove Cars":
             num_cars = st.slider("Number of Cars Removed (1,000 - 10,000)", 1000, 10000, 1000, step=100)
@@ -821,4 +1143,4 @@ elif page == "🌱 AQI Assistant":
             ax.set_title(f'AQI Before and After Removing {num_cars:,} Cars')
             ax.set_ylabel('AQI')
             plt.tight_layout()
-            st.pyplot(fig)
+            show_figure(fig)
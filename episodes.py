@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+WINDOW_DAYS = 30          # trailing readings used for the rolling baseline
+MIN_PERIODS = 7           # readings required before a z-score is reported
+Z_THRESHOLD = 3.0
+SPIKE_DELTA = 100         # day-over-day AQI jump that counts as a sudden spike
+SPIKE_RATIO = 1.5
+POOR_AQI = 200            # AQI above this is "Poor" or worse, see get_aqi_category
+MIN_EPISODE_DAYS = 3
+
+EPISODE_COLUMNS = ['City', 'Start', 'End', 'Days', 'Peak AQI', 'Mean AQI']
+ANOMALY_COLUMNS = ['City', 'Date', 'AQI', 'Baseline', 'Z-score', 'Change', 'Anomaly', 'Spike']
+
+
+def _prepare(days):
+    days = days[['City', 'Date', 'AQI']].dropna(subset=['AQI'])
+    days = days.assign(Date=pd.to_datetime(days['Date']))
+    return days.sort_values(['City', 'Date'], kind='stable').reset_index(drop=True)
+
+
+def score_days(days):
+    # One grouped pass over every city: rolling baseline, z-score, spikes and
+    # run-lengths of consecutive Poor-or-worse days. `days` must be sorted by
+    # City then Date with a RangeIndex (see _prepare).
+    grouped = days.groupby('City', sort=False)['AQI']
+    rolling = grouped.rolling(WINDOW_DAYS, min_periods=MIN_PERIODS)
+    mean = rolling.mean().reset_index(level=0, drop=True)
+    std = rolling.std().reset_index(level=0, drop=True)
+
+    # Each day is compared against the window that ends the day before it
+    baseline = mean.groupby(days['City'], sort=False).shift(1)
+    spread = std.groupby(days['City'], sort=False).shift(1).replace(0, np.nan)
+    previous = grouped.shift(1)
+
+    scored = days.copy()
+    scored['Baseline'] = baseline
+    scored['Z-score'] = (days['AQI'] - baseline) / spread
+    scored['Change'] = days['AQI'] - previous
+    scored['Anomaly'] = scored['Z-score'].abs() >= Z_THRESHOLD
+    scored['Spike'] = (scored['Change'] >= SPIKE_DELTA) & (days['AQI'] >= previous * SPIKE_RATIO)
+
+    poor = days['AQI'] > POOR_AQI
+    new_city = days['City'] != days['City'].shift(1)
+    gap = days['Date'].diff() != pd.Timedelta(days=1)
+    run_id = (new_city | gap | (poor != poor.shift(1))).cumsum()
+    scored['Poor'] = poor
+    scored['run_length'] = np.where(poor, days.groupby(run_id).cumcount() + 1, 0)
+    scored['run_id'] = run_id
+    return scored
+
+
+def extract_episodes(scored):
+    poor = scored[scored['Poor']]
+    if poor.empty:
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+    episodes = poor.groupby('run_id').agg(
+        City=('City', 'first'),
+        Start=('Date', 'min'),
+        End=('Date', 'max'),
+        Days=('Date', 'size'),
+        **{'Peak AQI': ('AQI', 'max'), 'Mean AQI': ('AQI', 'mean')}
+    )
+    return episodes[episodes['Days'] >= MIN_EPISODE_DAYS].reset_index(drop=True)[EPISODE_COLUMNS]
+
+
+def extract_anomalies(scored):
+    return scored.loc[scored['Anomaly'] | scored['Spike'], ANOMALY_COLUMNS].reset_index(drop=True)
+
+
+class EpisodeIndex:
+    def __init__(self, days):
+        self.days = score_days(_prepare(days))
+        self.episodes = self._index(extract_episodes(self.days), 'Start')
+        self.anomalies = self._index(extract_anomalies(self.days), 'Date')
+
+    @staticmethod
+    def _index(frame, date_column):
+        return frame.set_index(['City', date_column], drop=False).sort_index()
+
+    def episodes_for(self, city, start=None, end=None):
+        if city not in self.episodes.index.get_level_values(0):
+            return self.episodes.iloc[0:0]
+        episodes = self.episodes.loc[[city]]
+        if start is not None:
+            episodes = episodes[episodes['End'] >= pd.Timestamp(start)]
+        if end is not None:
+            episodes = episodes[episodes['Start'] <= pd.Timestamp(end)]
+        return episodes.reset_index(drop=True)
+
+    def anomalies_for(self, city, start=None, end=None):
+        if city not in self.anomalies.index.get_level_values(0):
+            return self.anomalies.iloc[0:0]
+        anomalies = self.anomalies.loc[city]
+        return anomalies.loc[start:end].reset_index(drop=True)
+
+    def update(self, new_days):
+        # Only the trailing window of each affected city, extended back to the
+        # start of any episode still open on its last day, is rescored.
+        new_days = _prepare(new_days)
+        last_date = self.days.groupby('City')['Date'].max()
+        known_last = new_days['City'].map(last_date)
+        new_days = new_days[known_last.isna() | (new_days['Date'] > known_last)]
+        if new_days.empty:
+            return new_days
+        cities = new_days['City'].unique()
+
+        history = self.days[self.days['City'].isin(cities)]
+        tail_start = history.groupby('City').tail(WINDOW_DAYS).groupby('City')['Date'].min()
+        last = history.groupby('City').tail(1).set_index('City')
+        open_start = (last['Date'] - pd.to_timedelta(last['run_length'] - 1, unit='D'))[last['Poor']]
+        context_start = pd.concat([tail_start, open_start], axis=1).min(axis=1)
+        # A batch of cities not seen before has no history to take context from
+        context = history[history['Date'] >= history['City'].map(context_start)] if len(history) else history
+
+        first_new = new_days.groupby('City')['Date'].min()
+        cut = first_new.copy()
+        cut.update(open_start[open_start.index.isin(cut.index)])
+
+        rescored = score_days(_prepare(pd.concat([context, new_days])))
+        fresh = rescored[rescored['Date'] >= rescored['City'].map(first_new)].copy()
+        fresh['run_id'] += self.days['run_id'].max() + 1
+        self.days = pd.concat([self.days, fresh], ignore_index=True)
+
+        episodes = extract_episodes(rescored)
+        episodes = episodes[episodes['Start'] >= episodes['City'].map(cut)]
+        stale = self.episodes['City'].isin(cities) & (self.episodes['End'] >= self.episodes['City'].map(cut))
+        self.episodes = self._index(
+            pd.concat([self.episodes[~stale].reset_index(drop=True), episodes], ignore_index=True), 'Start'
+        )
+        self.anomalies = self._index(
+            pd.concat([self.anomalies.reset_index(drop=True), extract_anomalies(fresh)], ignore_index=True), 'Date'
+        )
+        return fresh
@@ -0,0 +1,354 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from session_memory import APP_PATH
+
+VIEW_SELECTOR_LABEL = "Choose View"
+CHANGEABLE_WIDGETS = ('selectbox', 'radio', 'number_input', 'button', 'checkbox')
+# One-shot values: a browser sends them for the rerun they trigger only
+TRIGGER_VALUES = ('trigger_value', 'string_trigger_value', 'json_trigger_value', 'chat_input_value')
+
+
+class StubAPI:
+    # Local stand-in for the WAQI feed and OpenWeatherMap endpoints used by
+    # get_live_aqi/get_weather_data, with configurable latency and failure rate.
+
+    def __init__(self, latency_ms=50.0, jitter_ms=20.0, failure_rate=0.0, seed=0, port=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    delay = max(0.0, stub._rng.gauss(stub.latency_ms, stub.jitter_ms)) / 1000
+                    fail = stub._rng.random() < stub.failure_rate
+                    aqi = stub._rng.randint(20, 450)
+                    stub.requests += 1
+                    stub.failures += fail
+                time.sleep(delay)
+                if fail:
+                    self._reply(503, b"Service Unavailable", "text/plain")
+                    return
+                path = urlparse(self.path)
+                if path.path.startswith("/feed/"):
+                    city = path.path.strip("/").split("/")[-1]
+                    body = {"status": "ok", "data": {"aqi": aqi, "city": {"name": city}}}
+                elif path.path == "/data/2.5/weather":
+                    body = {
+                        "cod": 200,
+                        "name": parse_qs(path.query).get("q", [""])[0],
+                        "main": {"temp": 28.5, "humidity": 64},
+                        "wind": {"speed": 2.1}
+                    }
+                else:
+                    self._reply(404, b"Not Found", "text/plain")
+                    return
+                self._reply(200, json.dumps(body).encode(), "application/json")
+
+            def _reply(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app(port, stub_url, log_path=None, startup_timeout=120):
+    env = dict(os.environ, WAQI_API_URL=stub_url, OPENWEATHER_API_URL=stub_url)
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH,
+         "--server.headless", "true",
+         "--server.port", str(port),
+         "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=os.path.dirname(APP_PATH), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {process.returncode} during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("streamlit did not become healthy in time")
+
+
+class SimulatedUser:
+    # One browser session over the Streamlit websocket protocol: it sends
+    # rerun requests with widget states and times each rerun until the server
+    # reports that the script finished. Like a browser, every rerun carries the
+    # last value of every widget still on the page, not just the changed one.
+
+    def __init__(self, url, rng, timeout):
+        self.url = url
+        self.rng = rng
+        self.timeout = timeout
+        self.ws = None
+        self.page_script_hash = ""
+        self.widgets = {}
+        self.states = {}
+
+    async def connect(self):
+        self.page_script_hash = ""
+        self.widgets = {}
+        self.states = {}
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None,
+                                           open_timeout=self.timeout, close_timeout=self.timeout)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+
+    async def rerun(self, changes=()):
+        states = dict(self.states)
+        states.update((state.id, state) for state in changes)
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = self.page_script_hash
+        msg.rerun_script.widget_states.widgets.extend(states.values())
+        widgets = {}
+        failed = False
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+            kind = forward.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = forward.new_session.page_script_hash
+            elif kind == 'delta' and forward.delta.WhichOneof('type') == 'new_element':
+                element = forward.delta.new_element
+                element_kind = element.WhichOneof('type')
+                if element_kind == 'exception':
+                    failed = True
+                elif element_kind in CHANGEABLE_WIDGETS:
+                    widget = getattr(element, element_kind)
+                    widgets[widget.id] = (element_kind, widget, forward.metadata.delta_path[0])
+            elif kind == 'script_finished':
+                if forward.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                failed = failed or forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR
+                break
+        self.widgets = widgets
+        # Widgets no longer rendered are forgotten, as the frontend does
+        self.states = {
+            widget_id: state for widget_id, state in states.items()
+            if widget_id in widgets and state.WhichOneof('value') not in TRIGGER_VALUES
+        }
+        return time.perf_counter() - start, failed
+
+    def view_selector(self):
+        for widget_id, (kind, widget, _) in self.widgets.items():
+            if kind == 'selectbox' and widget.label == VIEW_SELECTOR_LABEL:
+                return widget
+        raise RuntimeError("The sidebar view selector was not rendered")
+
+    def random_change(self):
+        # Main-area widgets only (delta path 0); the sidebar holds the view selector
+        candidates = [(kind, widget) for kind, widget, container in self.widgets.values() if container == 0]
+        if not candidates:
+            return None
+        kind, widget = self.rng.choice(candidates)
+        state = WidgetState(id=widget.id)
+        if kind in ('selectbox', 'radio'):
+            if not widget.options:
+                return None
+            state.string_value = self.rng.choice(list(widget.options))
+        elif kind == 'number_input':
+            low = widget.min if widget.has_min else 0.0
+            high = widget.max if widget.has_max else max(widget.default * 2, 1.0)
+            state.double_value = round(self.rng.uniform(low, high), 1)
+        elif kind == 'button':
+            state.trigger_value = True
+        elif kind == 'checkbox':
+            state.bool_value = not widget.default
+        return state
+
+
+async def run_user(url, seed, timeout, samples, errors, stop_at):
+    # A timeout or dropped connection is recorded as an error, not as a latency
+    # sample, and the user reconnects with a fresh session until stop_at, like
+    # a browser tab reloading after the connection was lost.
+    user = SimulatedUser(url, random.Random(seed), timeout)
+    while time.monotonic() < stop_at:
+        view, action = None, 'connect'
+        try:
+            await user.connect()
+            await user.rerun()
+            views = list(user.view_selector().options)
+            view_id = user.view_selector().id
+            while time.monotonic() < stop_at:
+                for view in user.rng.sample(views, len(views)):
+                    if time.monotonic() >= stop_at:
+                        break
+                    view_state = WidgetState(id=view_id, string_value=view)
+                    action = 'switch'
+                    latency, failed = await user.rerun([view_state])
+                    samples.append((view, action, latency, failed))
+                    change = user.random_change()
+                    if change is not None and time.monotonic() < stop_at:
+                        action = 'widget'
+                        latency, failed = await user.rerun([view_state, change])
+                        samples.append((view, action, latency, failed))
+        except (asyncio.TimeoutError, websockets.ConnectionClosed, OSError, RuntimeError) as exc:
+            errors.append((view, action, type(exc).__name__))
+            # Back off briefly so an app that refuses connections is not hammered
+            await asyncio.sleep(max(0.0, min(1.0, stop_at - time.monotonic())))
+        finally:
+            await user.close()
+
+
+async def run_level(url, users, duration, timeout, seed):
+    samples = []
+    errors = []
+    stop_at = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(run_user(url, seed + i, timeout, samples, errors, stop_at) for i in range(users)))
+    elapsed = time.perf_counter() - start
+    return (pd.DataFrame(samples, columns=['View', 'Action', 'Latency', 'Failed']),
+            pd.DataFrame(errors, columns=['View', 'Action', 'Error']), elapsed)
+
+
+def summarize(samples, errors, elapsed, users):
+    # Latency percentiles cover completed reruns only. The error rate counts
+    # reruns that raised in the app plus timeouts and dropped connections.
+    latency_ms = samples['Latency'].to_numpy() * 1000
+    p50, p90, p95, p99 = np.percentile(latency_ms, [50, 90, 95, 99]) if len(latency_ms) else [np.nan] * 4
+    attempts = len(samples) + len(errors)
+    return {
+        'Users': users,
+        'Reruns': len(samples),
+        'Throughput (reruns/s)': len(samples) / elapsed,
+        'p50 (ms)': p50,
+        'p90 (ms)': p90,
+        'p95 (ms)': p95,
+        'p99 (ms)': p99,
+        'Timeouts/disconnects': len(errors),
+        'Error rate': (samples['Failed'].sum() + len(errors)) / attempts if attempts else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test app.py with simulated sessions against local WAQI/OpenWeatherMap stubs.")
+    parser.add_argument("--users", default="1,5,10,20", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency level")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a rerun counts as failed")
+    parser.add_argument("--url", help="Websocket URL of an already running app "
+                                      "(e.g. ws://localhost:8501/_stcore/stream); its API URLs must point at a stub")
+    parser.add_argument("--stub-latency-ms", type=float, default=50)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20)
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    parser.add_argument("--stub-port", type=int, default=0, help="Port for the stub when used with --url")
+    parser.add_argument("--by-view", action="store_true", help="Also print latency by view for each level")
+    parser.add_argument("--server-log", help="Write the streamlit server output to this file")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any level's p95 rerun latency exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if any level's error rate exceeds this")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubAPI(args.stub_latency_ms, args.stub_jitter_ms, args.stub_failure_rate, args.seed, args.stub_port)
+    stub.start()
+    app = None
+    url = args.url
+    try:
+        if url is None:
+            port = free_port()
+            app = start_app(port, stub.url, args.server_log)
+            url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        print(f"Stub API at {stub.url}, app at {url}")
+
+        rows = []
+        for users in [int(n) for n in args.users.split(",")]:
+            stub_before = (stub.requests, stub.failures)
+            samples, errors, elapsed = asyncio.run(run_level(url, users, args.duration, args.timeout, args.seed))
+            row = summarize(samples, errors, elapsed, users)
+            row['API calls'] = stub.requests - stub_before[0]
+            row['API failures'] = stub.failures - stub_before[1]
+            rows.append(row)
+            print(f"{users} users: {row['Reruns']} reruns, p95 {row['p95 (ms)']:.0f} ms, "
+                  f"{row['Timeouts/disconnects']} timeouts/disconnects, error rate {row['Error rate']:.1%}")
+            if args.by_view:
+                by_view = samples.dropna(subset=['View']).groupby('View')['Latency']
+                print((by_view.describe(percentiles=[0.5, 0.95])[['count', '50%', '95%', 'max']] * [1, 1000, 1000, 1000])
+                      .round(1).to_string())
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(timeout=30)
+        stub.stop()
+
+    report = pd.DataFrame(rows)
+    print(report.round(2).to_string(index=False))
+    failures = []
+    if args.max_p95_ms is not None and (report['p95 (ms)'] > args.max_p95_ms).any():
+        failures.append(f"p95 latency above {args.max_p95_ms:.0f} ms")
+    if args.max_error_rate is not None and (report['Error rate'] > args.max_error_rate).any():
+        failures.append(f"error rate above {args.max_error_rate:.2%}")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_DIR = os.environ.get("AQI_MODEL_REGISTRY", "models")
+LEGACY_MODEL_PATH = "aqi_predictor_model.pkl"
+LEGACY_VERSION = "legacy"
+ARTIFACT_NAME = "model.pkl"
+CALIBRATION_NAME = "calibration.csv"
+LEGACY_CALIBRATION_PATH = "aqi_predictor_calibration.csv"
+ACTIVE_POINTER = "ACTIVE"
+FEATURES = ['PM2.5', 'PM10', 'NO2', 'CO', 'O3']
+MAX_LOADED_MODELS = 3
+
+
+def _atomic_write(path, data, mode="w"):
+    # Write to a temp file in the same directory and rename over the target so
+    # readers only ever see the old or the new content, never a partial file.
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR, legacy_path=LEGACY_MODEL_PATH, legacy_calibration_path=LEGACY_CALIBRATION_PATH):
+        self.root = root
+        self.legacy_path = legacy_path
+        self.legacy_calibration_path = legacy_calibration_path
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self._active = None
+        self._pointer_stamp = None
+        self.load_error = None
+
+    @property
+    def pointer_path(self):
+        return os.path.join(self.root, ACTIVE_POINTER)
+
+    def artifact_path(self, version):
+        if version == LEGACY_VERSION:
+            return self.legacy_path
+        return os.path.join(self.root, version, ARTIFACT_NAME)
+
+    def calibration_path(self, version):
+        if version == LEGACY_VERSION:
+            return self.legacy_calibration_path
+        return os.path.join(self.root, version, CALIBRATION_NAME)
+
+    def calibration_stamp(self, version):
+        # Changes whenever the calibration set is added, replaced or removed
+        try:
+            stat = os.stat(self.calibration_path(version))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    def load_calibration(self, version):
+        # Rows the model never saw in training, recorded when it was registered.
+        # Without them there is no honest hold-out for this version: None.
+        path = self.calibration_path(version)
+        if not os.path.isfile(path):
+            return None
+        return read_labelled_rows(path)
+
+    def shared_holdout(self, versions):
+        # Rows held out from the training of every one of `versions`: the rows
+        # common to their registered calibration sets, or None.
+        common = None
+        for version in versions:
+            calibration = self.load_calibration(version)
+            if calibration is None:
+                return None
+            rows = pd.DataFrame(np.column_stack(calibration), columns=FEATURES + ['AQI']).drop_duplicates()
+            common = rows if common is None else common.merge(rows)
+        if common is None or common.empty:
+            return None
+        return common[FEATURES].to_numpy(), common['AQI'].to_numpy()
+
+    def versions(self):
+        versions = []
+        if os.path.isdir(self.root):
+            versions = sorted(
+                name for name in os.listdir(self.root)
+                if os.path.isfile(os.path.join(self.root, name, ARTIFACT_NAME))
+            )
+        if os.path.isfile(self.legacy_path):
+            versions.insert(0, LEGACY_VERSION)
+        return versions
+
+    def active_version(self):
+        try:
+            with open(self.pointer_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return LEGACY_VERSION
+        return version or LEGACY_VERSION
+
+    def load(self, version):
+        with self._lock:
+            if version in self._loaded:
+                self._loaded.move_to_end(version)
+                return self._loaded[version]
+        with open(self.artifact_path(version), 'rb') as f:
+            model = pickle.load(f)
+        with self._lock:
+            self._loaded[version] = model
+            self._loaded.move_to_end(version)
+            while len(self._loaded) > MAX_LOADED_MODELS:
+                self._loaded.popitem(last=False)
+        return model
+
+    def get_active(self):
+        # A stat of the pointer file per call is enough to notice an activation
+        # from another process. The new model is fully loaded before the swap, and
+        # callers keep whatever (version, model) pair they already hold. If the
+        # newly activated version fails to load, the previous model keeps serving
+        # and the failure is kept in load_error until the pointer changes again.
+        try:
+            stat = os.stat(self.pointer_path)
+            stamp = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        active = self._active
+        if active is not None and stamp == self._pointer_stamp:
+            return active
+        version = self.active_version()
+        if active is None or active[0] != version:
+            try:
+                active = (version, self.load(version))
+            except Exception as exc:
+                if self._active is None:
+                    raise
+                with self._lock:
+                    self.load_error = (version, exc)
+                    self._pointer_stamp = stamp
+                return self._active
+        with self._lock:
+            self._active = active
+            self._pointer_stamp = stamp
+            self.load_error = None
+        return active
+
+    def register(self, source_path, version=None, calibration_path=None):
+        if version is None:
+            version = time.strftime("v%Y%m%d-%H%M%S")
+        if version == LEGACY_VERSION or os.sep in version or version.startswith('.'):
+            raise ValueError(f"Invalid model version name: {version!r}")
+        target_dir = os.path.join(self.root, version)
+        if os.path.exists(os.path.join(target_dir, ARTIFACT_NAME)):
+            raise ValueError(f"Model version {version!r} is already registered")
+        with open(source_path, 'rb') as f:
+            pickle.load(f)  # refuse artifacts that do not unpickle
+        if calibration_path is not None:
+            read_labelled_rows(calibration_path)  # and calibration sets without the features and AQI
+        os.makedirs(target_dir, exist_ok=True)
+        # The calibration set goes in first: once model.pkl exists the version is
+        # visible to running apps, and they must not see it without its hold-out.
+        if calibration_path is not None:
+            tmp_path = os.path.join(target_dir, f".{CALIBRATION_NAME}.tmp")
+            shutil.copyfile(calibration_path, tmp_path)
+            os.replace(tmp_path, os.path.join(target_dir, CALIBRATION_NAME))
+        tmp_path = os.path.join(target_dir, f".{ARTIFACT_NAME}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, os.path.join(target_dir, ARTIFACT_NAME))
+        return version
+
+    def activate(self, version):
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version: {version!r}")
+        os.makedirs(self.root, exist_ok=True)
+        _atomic_write(self.pointer_path, version + "\n")
+
+
+def read_labelled_rows(path):
+    df = pd.read_csv(path, usecols=FEATURES + ['AQI']).dropna()
+    if df.empty:
+        raise ValueError(f"No complete rows with {', '.join(FEATURES)} and AQI in {path}")
+    return df[FEATURES].to_numpy(dtype=float), df['AQI'].to_numpy(dtype=float)
+
+
+def load_holdout(path="city_day.csv", fraction=0.2):
+    # The most recent `fraction` of days. Models trained on all of city_day.csv
+    # have seen these rows, so scores on them are only a true hold-out for
+    # models trained on a time split.
+    df = pd.read_csv(path, usecols=['Date'] + FEATURES + ['AQI'], parse_dates=['Date'])
+    df = df.dropna(subset=FEATURES + ['AQI'])
+    cutoff = df['Date'].quantile(1 - fraction)
+    holdout = df[df['Date'] >= cutoff]
+    return holdout[FEATURES].to_numpy(), holdout['AQI'].to_numpy()
+
+
+def score_model(model, X, y, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictions = model.predict(X)
+        timings.append(time.perf_counter() - start)
+    errors = predictions - y
+    latency_ms = np.median(timings) * 1000
+    return predictions, {
+        'MAE': np.abs(errors).mean(),
+        'RMSE': np.sqrt((errors ** 2).mean()),
+        'R2': 1 - (errors ** 2).sum() / ((y - y.mean()) ** 2).sum(),
+        'Batch latency (ms)': latency_ms,
+        'Latency per 1k rows (ms)': latency_ms * 1000 / len(X)
+    }
+
+
+def compare_models(models, X, y, repeats=3):
+    # Shadow/A-B scoring: every model sees the same batch, results side by side.
+    rows = {}
+    predictions = {}
+    for version, model in models.items():
+        predictions[version], rows[version] = score_model(model, X, y, repeats)
+    report = pd.DataFrame(rows).T
+    report.index.name = 'Version'
+    if len(predictions) == 2:
+        first, second = predictions.values()
+        report.attrs['mean_abs_disagreement'] = np.abs(first - second).mean()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local AQI model registry.")
+    parser.add_argument("--root", default=REGISTRY_DIR, help="Registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List registered versions")
+    register = commands.add_parser("register", help="Register a pickled model")
+    register.add_argument("path")
+    register.add_argument("--version")
+    register.add_argument("--calibration",
+                          help="CSV of rows held out from training (PM2.5, PM10, NO2, CO, O3, AQI), "
+                               "used to calibrate prediction intervals")
+    register.add_argument("--activate", action="store_true")
+    activate = commands.add_parser("activate", help="Point the running apps at a version")
+    activate.add_argument("version")
+    compare = commands.add_parser("compare", help="A/B score two versions on held-out data")
+    compare.add_argument("version_a")
+    compare.add_argument("version_b")
+    compare.add_argument("--data", default="city_day.csv",
+                         help="Rows to score when the two versions share no registered hold-out")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "list":
+        active = registry.active_version()
+        for version in registry.versions():
+            print(("* " if version == active else "  ") + version)
+    elif args.command == "register":
+        version = registry.register(args.path, args.version, args.calibration)
+        print(f"Registered {version}")
+        if args.activate:
+            registry.activate(version)
+            print(f"Activated {version}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Activated {args.version}")
+    elif args.command == "compare":
+        if args.version_a == args.version_b:
+            parser.error("compare needs two different versions")
+        rows = registry.shared_holdout([args.version_a, args.version_b])
+        if rows is None:
+            X, y = load_holdout(args.data)
+            print(f"Scoring on recent {args.data} rows (may overlap training)")
+        else:
+            X, y = rows
+            print("Scoring on rows held out from the training of both versions")
+        models = {v: registry.load(v) for v in (args.version_a, args.version_b)}
+        report = compare_models(models, X, y)
+        print(report.round(3).to_string())
+        if 'mean_abs_disagreement' in report.attrs:
+            print(f"Mean absolute disagreement: {report.attrs['mean_abs_disagreement']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Reporting resolution of the station sensors for each model feature
+# (PM2.5, PM10, NO2 in µg/m³, CO in mg/m³, O3 in µg/m³). Inputs closer together
+# than this are indistinguishable readings and share a cache entry.
+SENSOR_RESOLUTION = np.array([1.0, 1.0, 1.0, 0.1, 1.0])
+
+
+class PredictionCache:
+    def __init__(self, maxsize=10000, ttl=3600, resolution=SENSOR_RESOLUTION):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.resolution = np.asarray(resolution, dtype=float)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.scored = 0
+
+    def quantize(self, X):
+        return np.rint(np.asarray(X, dtype=float) / self.resolution).astype(np.int64)
+
+    def score(self, version, X, score_fn):
+        # Rows are quantized, duplicates within the batch collapsed, cached rows
+        # served from memory and only the remaining unique rows go to score_fn in
+        # a single call. `version` keeps results of different models apart.
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        finite = np.isfinite(X).all(axis=1)
+        if finite.all():
+            return self._score_cached(version, X, score_fn)
+
+        # Rows with missing or non-finite readings have no meaningful quantized
+        # key, so they bypass the cache and reach score_fn unchanged.
+        uncached = np.asarray(score_fn(X[~finite]))
+        with self._lock:
+            self.requests += len(uncached)
+            self.misses += len(uncached)
+            self.scored += len(uncached)
+        result = np.empty((len(X),) + uncached.shape[1:], dtype=float)
+        result[~finite] = uncached
+        if finite.any():
+            result[finite] = self._score_cached(version, X[finite], score_fn)
+        return result
+
+    def _score_cached(self, version, X, score_fn):
+        keys = self.quantize(X)
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        values = [None] * len(unique_keys)
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(map(tuple, unique_keys.tolist())):
+                entry = self._entries.get((version, key))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((version, key))
+                    values[i] = entry[0]
+                else:
+                    missing.append(i)
+
+        if missing:
+            scored = score_fn(unique_keys[missing] * self.resolution)
+            expires = time.monotonic() + self.ttl
+            with self._lock:
+                for i, value in zip(missing, scored):
+                    values[i] = value
+                    key = (version, tuple(unique_keys[i].tolist()))
+                    self._entries[key] = (value, expires)
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        # All counters are in rows: hits + misses == requests. Of the missed rows,
+        # `deduplicated` shared a key with another row of the same batch and
+        # only `scored` rows actually reached the model.
+        missed_rows = int(np.isin(inverse, missing).sum())
+        with self._lock:
+            self.requests += len(X)
+            self.hits += len(X) - missed_rows
+            self.misses += missed_rows
+            self.deduplicated += missed_rows - len(missing)
+            self.scored += len(missing)
+        return np.asarray(values)[inverse]
+
+    def predict(self, model, version, X):
+        return self.score(version, X, model.predict)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'deduplicated': self.deduplicated,
+                'scored': self.scored,
+                'hit_rate': self.hits / self.requests if self.requests else 0.0,
+                'size': len(self._entries)
+            }
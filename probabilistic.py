@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+AQI_BUCKETS = ['Good', 'Satisfactory', 'Moderate', 'Poor', 'Very Poor', 'Severe']
+BUCKET_UPPER_BOUNDS = np.array([50, 100, 200, 300, 400])  # same cut points as get_aqi_category
+
+
+def point_and_spread(model, X):
+    # Bagged tree ensembles average their trees, so the per-tree predictions give
+    # the point estimate and its spread in one pass. Other models only give a point.
+    X = np.asarray(X, dtype=float)
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        per_tree = np.stack([tree.predict(X32, check_input=False) for tree in model.estimators_])
+        return per_tree.mean(axis=0), per_tree.std(axis=0)
+    return np.asarray(model.predict(X), dtype=float), None
+
+
+class ConformalAQIPredictor:
+    # Split conformal calibration on held-out rows. Residuals are normalised by
+    # the ensemble spread where the model has one (locally weighted conformal),
+    # so intervals widen where the trees disagree.
+
+    def __init__(self, model, spread_floor=1.0):
+        self.model = model
+        self.spread_floor = spread_floor
+        self.scores = None
+
+    def _point_and_scale(self, X):
+        point, spread = point_and_spread(self.model, X)
+        scale = np.ones_like(point) if spread is None else np.maximum(spread, self.spread_floor)
+        return point, scale
+
+    def fit(self, X_cal, y_cal):
+        point, scale = self._point_and_scale(X_cal)
+        self.scores = np.sort((np.asarray(y_cal, dtype=float) - point) / scale)
+        return self
+
+    def _score_quantile(self, level):
+        # Finite-sample conformal correction: the ceil((n + 1) * level)-th score
+        n = len(self.scores)
+        rank = np.clip(np.ceil((n + 1) * np.asarray(level)) - 1, 0, n - 1).astype(int)
+        return self.scores[rank]
+
+    def _cdf(self, point, scale, thresholds):
+        z = (thresholds[np.newaxis, :] - point[:, np.newaxis]) / scale[:, np.newaxis]
+        return np.searchsorted(self.scores, z.ravel(), side='right').reshape(z.shape) / len(self.scores)
+
+    def predict(self, X, coverage=0.9):
+        if self.scores is None:
+            raise RuntimeError("ConformalAQIPredictor must be fitted before predicting")
+        point, scale = self._point_and_scale(X)
+        alpha = 1 - coverage
+        low_q, high_q = self._score_quantile([alpha / 2, 1 - alpha / 2])
+        cdf = self._cdf(point, scale, BUCKET_UPPER_BOUNDS)
+        cdf = np.hstack([np.zeros((len(point), 1)), cdf, np.ones((len(point), 1))])
+        result = pd.DataFrame({
+            'AQI': point,
+            'Lower': np.maximum(point + low_q * scale, 0),
+            'Upper': point + high_q * scale
+        })
+        result[AQI_BUCKETS] = np.diff(cdf, axis=1)
+        return result
+
+    def exceedance_probability(self, X, threshold):
+        point, scale = self._point_and_scale(X)
+        return 1 - self._cdf(point, scale, np.array([threshold], dtype=float))[:, 0]
@@ -0,0 +1,172 @@
+import argparse
+import gc
+import os
+import resource
+import sys
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if isinstance(obj, np.ndarray):
+        # getsizeof includes the buffer only when the array owns it; views do not count their base
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def session_state_bytes(session_state):
+    # The runtime's SessionState is iterable but has no keys(), and widget values
+    # can disappear between iteration and lookup while a rerun is in progress.
+    total = 0
+    for key in list(session_state):
+        try:
+            value = session_state[key]
+        except KeyError:
+            continue
+        total += deep_sizeof(key) + deep_sizeof(value)
+    return total
+
+
+def media_bytes_by_session(media_file_mgr):
+    # Images from st.pyplot and download_button payloads are held per session by
+    # the media file manager; files shared by sessions are counted for each.
+    # These are private Streamlit internals: if they change, media is reported
+    # as zero rather than failing.
+    files = getattr(getattr(media_file_mgr, '_storage', None), '_files_by_id', None)
+    by_session = getattr(media_file_mgr, '_files_by_session_and_coord', None)
+    if not isinstance(files, dict) or not isinstance(by_session, dict):
+        return {}
+    usage = {}
+    try:
+        for session_id, coords in list(by_session.items()):
+            usage[session_id] = sum(
+                len(getattr(files[file_id], 'content', b'')) for file_id in list(coords.values()) if file_id in files
+            )
+    except (AttributeError, TypeError):
+        return {}
+    return usage
+
+
+def active_sessions_report():
+    # Relies on private runtime attributes (streamlit is unpinned); any
+    # mismatch degrades to an empty report instead of breaking the rerun.
+    columns = ['Session', 'Session state (bytes)', 'Media files (bytes)', 'Total (bytes)']
+    empty = pd.DataFrame(columns=columns)
+    try:
+        from streamlit.runtime import Runtime
+
+        if not Runtime.exists():
+            return empty
+        runtime = Runtime.instance()
+        session_mgr = getattr(runtime, '_session_mgr', None)
+        list_sessions = getattr(session_mgr, 'list_active_sessions', None)
+        if list_sessions is None:
+            # Bare mode or streamlit.testing, where there is no session manager
+            return empty
+        media = media_bytes_by_session(getattr(runtime, 'media_file_mgr', None))
+        rows = []
+        for info in list_sessions():
+            session = info.session
+            state_bytes = session_state_bytes(session.session_state)
+            media_bytes = media.get(session.id, 0)
+            rows.append({
+                'Session': session.id[:8],
+                'Session state (bytes)': state_bytes,
+                'Media files (bytes)': media_bytes,
+                'Total (bytes)': state_bytes + media_bytes
+            })
+    except (ImportError, AttributeError, TypeError):
+        return empty
+    return pd.DataFrame(rows, columns=columns)
+
+
+def current_rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak RSS is the best portable fallback (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_load_test(sessions, pages, timeout=120):
+    # Simulated sessions are kept alive together so their state accumulates
+    # like concurrent browser tabs on one server process.
+    from streamlit.testing.v1 import AppTest
+
+    # A throwaway first session warms the shared caches so that only
+    # per-session growth is measured.
+    warmup = AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    for page in pages:
+        warmup.sidebar.selectbox[0].set_value(page).run()
+    del warmup
+
+    alive = []
+    rows = []
+    gc.collect()
+    baseline = current_rss_bytes()
+    for n in range(1, sessions + 1):
+        at = AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+        for page in pages:
+            at.sidebar.selectbox[0].set_value(page).run()
+        alive.append(at)
+        gc.collect()
+        rss = current_rss_bytes()
+        rows.append({
+            'Sessions': n,
+            'RSS (MB)': rss / 2 ** 20,
+            'RSS growth (MB)': (rss - baseline) / 2 ** 20,
+            'Growth per session (KB)': (rss - baseline) / n / 1024,
+            'Session state (bytes)': session_state_bytes(at.session_state),
+            'Open figures': len(plt.get_fignums())
+        })
+    return pd.DataFrame(rows)
+
+
+def app_pages():
+    # The view names are read from the sidebar selectbox in app.py
+    import ast
+
+    with open(APP_PATH) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and getattr(node.func, 'attr', None) == 'selectbox'
+                and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == "Choose View"):
+            return [ast.literal_eval(element) for element in node.args[1].elts]
+    raise RuntimeError("Could not find the sidebar view selector in app.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-session memory of the AQI dashboard.")
+    parser.add_argument("--sessions", type=int, default=20, help="Number of simulated sessions")
+    parser.add_argument("--page", action="append", dest="pages",
+                        help="Sidebar view to visit in each session (repeatable, default: all views)")
+    parser.add_argument("--every", type=int, default=5, help="Print one row every N sessions")
+    args = parser.parse_args()
+
+    pages = args.pages or app_pages()
+    report = run_load_test(args.sessions, pages)
+    shown = report[(report['Sessions'] % args.every == 0) | (report['Sessions'] == 1)]
+    print(shown.round(1).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from episodes import ANOMALY_COLUMNS, EPISODE_COLUMNS, EpisodeIndex
+
+
+def make_days(seed=0):
+    # Two years of daily AQI for three cities with Poor-or-worse runs that
+    # cross month boundaries, sudden spikes, missing readings and a data gap.
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2019-01-01", "2020-12-31", freq="D")
+    frames = []
+    for city in ["Delhi", "Patna", "Kochi"]:
+        aqi = rng.normal(150, 40, len(dates)).clip(20)
+        for start in rng.choice(len(dates) - 10, 12, replace=False):
+            aqi[start:start + rng.integers(2, 9)] = rng.uniform(210, 450)
+        aqi[rng.choice(len(dates), 10, replace=False)] += 250
+        aqi[rng.choice(len(dates), 20, replace=False)] = np.nan
+        frames.append(pd.DataFrame({"City": city, "Date": dates, "AQI": aqi}))
+    # An episode longer than the rolling window, still open at a month's end
+    winter = (frames[0]["Date"] >= "2019-11-01") & (frames[0]["Date"] < "2020-01-16")
+    frames[0].loc[winter, "AQI"] = rng.uniform(250, 450, winter.sum())
+    days = pd.concat(frames, ignore_index=True)
+    # Kochi reports nothing for most of March 2020
+    return days[~((days["City"] == "Kochi") & days["Date"].between("2020-03-03", "2020-03-25"))]
+
+
+def canonical(frame, sort_by):
+    return frame.reset_index(drop=True).sort_values(sort_by).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_monthly_updates_match_full_rebuild(seed):
+    days = make_days(seed)
+    full = EpisodeIndex(days)
+
+    months = days["Date"].dt.to_period("M")
+    incremental = EpisodeIndex(days[months == months.min()])
+    for month in sorted(months.unique())[1:]:
+        incremental.update(days[months == month])
+
+    columns = [c for c in full.days.columns if c != "run_id"]
+    pd.testing.assert_frame_equal(
+        canonical(incremental.days[columns], ["City", "Date"]),
+        canonical(full.days[columns], ["City", "Date"])
+    )
+    pd.testing.assert_frame_equal(
+        canonical(incremental.episodes[EPISODE_COLUMNS], ["City", "Start"]),
+        canonical(full.episodes[EPISODE_COLUMNS], ["City", "Start"])
+    )
+    pd.testing.assert_frame_equal(
+        canonical(incremental.anomalies[ANOMALY_COLUMNS], ["City", "Date"]),
+        canonical(full.anomalies[ANOMALY_COLUMNS], ["City", "Date"])
+    )
+    assert len(full.episodes) > 0 and len(full.anomalies) > 0
+
+
+def test_update_ignores_days_already_indexed():
+    days = make_days()
+    index = EpisodeIndex(days)
+    before = len(index.days)
+    assert index.update(days.tail(50)).empty
+    assert len(index.days) == before
+
+
+def test_update_adds_new_city():
+    days = make_days()
+    index = EpisodeIndex(days[days["City"] != "Patna"])
+    index.update(days[days["City"] == "Patna"])
+    full = EpisodeIndex(days)
+    pd.testing.assert_frame_equal(
+        index.episodes_for("Patna")[EPISODE_COLUMNS], full.episodes_for("Patna")[EPISODE_COLUMNS]
+    )
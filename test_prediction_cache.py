@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+import prediction_cache
+from prediction_cache import PredictionCache
+
+
+class CountingModel:
+    def __init__(self):
+        self.rows = []
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        self.rows.append(len(X))
+        return np.nan_to_num(X).sum(axis=1)
+
+
+def check_counters(cache):
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == stats['requests']
+    assert stats['deduplicated'] + stats['scored'] == stats['misses']
+    return stats
+
+
+def test_counters_are_in_rows():
+    cache = PredictionCache()
+    model = CountingModel()
+    X = [[80, 100, 40, 1.0, 30], [60, 90, 20, 0.5, 10]]
+    cache.predict(model, "v1", X)
+    stats = check_counters(cache)
+    assert (stats['requests'], stats['hits'], stats['misses'], stats['scored']) == (2, 0, 2, 2)
+
+    cache.predict(model, "v1", X + [[10, 10, 10, 0.1, 10]])
+    stats = check_counters(cache)
+    assert (stats['requests'], stats['hits'], stats['misses'], stats['scored']) == (5, 2, 3, 3)
+    assert stats['hit_rate'] == pytest.approx(2 / 5)
+    assert model.rows == [2, 1]
+
+
+def test_duplicates_within_a_batch_are_scored_once():
+    cache = PredictionCache()
+    model = CountingModel()
+    # The last row quantizes to the same sensor readings as the first
+    X = [[80, 100, 40, 1.0, 30], [60, 90, 20, 0.5, 10], [80, 100, 40, 1.0, 30], [80.2, 99.9, 40, 1.02, 30]]
+    result = cache.predict(model, "v1", X)
+    stats = check_counters(cache)
+    assert (stats['requests'], stats['misses'], stats['deduplicated'], stats['scored']) == (4, 4, 2, 2)
+    assert model.rows == [2]
+    assert result[0] == result[2] == result[3]
+
+
+def test_versions_do_not_share_entries():
+    cache = PredictionCache()
+    model = CountingModel()
+    X = [[80, 100, 40, 1.0, 30]]
+    cache.predict(model, "v1", X)
+    cache.predict(model, "v2", X)
+    assert model.rows == [1, 1]
+    assert cache.stats()['size'] == 2
+
+
+def test_rows_with_missing_readings_bypass_the_cache():
+    cache = PredictionCache()
+    model = CountingModel()
+    X = np.array([[80, 100, 40, 1.0, 30], [np.nan, 100, 40, 1.0, 30], [80, np.inf, 40, 1.0, 30]])
+    result = cache.predict(model, "v1", X)
+    np.testing.assert_allclose(result, model.predict(X))
+    stats = check_counters(cache)
+    assert (stats['requests'], stats['misses'], stats['scored'], stats['size']) == (3, 3, 3, 1)
+
+    cache.predict(model, "v1", X)
+    stats = check_counters(cache)
+    # Only the finite row is served from the cache the second time
+    assert (stats['requests'], stats['hits'], stats['misses'], stats['size']) == (6, 1, 5, 1)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prediction_cache.time, "monotonic", lambda: now[0])
+    cache = PredictionCache(ttl=60)
+    model = CountingModel()
+    X = [[80, 100, 40, 1.0, 30]]
+    cache.predict(model, "v1", X)
+    now[0] += 59
+    cache.predict(model, "v1", X)
+    assert model.rows == [1]
+    now[0] += 2
+    cache.predict(model, "v1", X)
+    assert model.rows == [1, 1]
+    check_counters(cache)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = PredictionCache(maxsize=2)
+    model = CountingModel()
+    a, b, c = [[1, 1, 1, 0.1, 1]], [[2, 2, 2, 0.2, 2]], [[3, 3, 3, 0.3, 3]]
+    cache.predict(model, "v1", a)
+    cache.predict(model, "v1", b)
+    cache.predict(model, "v1", a)
+    cache.predict(model, "v1", c)
+    assert cache.stats()['size'] == 2
+    cache.predict(model, "v1", a)
+    cache.predict(model, "v1", b)
+    assert model.rows == [1, 1, 1, 1]